@@ -8,7 +8,7 @@ import time, so they always reflect the logged-in user's session credentials.
 """
 from services.database import fetch_cached as _fetch_cached
 from services.credentials import get_credentials
-import requests as _req
+from services.servicenow_client import sn_session, parse_result
 
 
 def fetch_with_fallback(table: str, limit: int = 500) -> list:
@@ -19,7 +19,7 @@ def fetch_with_fallback(table: str, limit: int = 500) -> list:
     """
     rows = []
     try:
-        rows = _fetch_cached(table) or []
+        rows = _fetch_cached(table, with_data=True) or []
     except Exception as e:
         print(f"[fetch] DB error on {table}: {e}")
 
@@ -37,10 +37,9 @@ def fetch_with_fallback(table: str, limit: int = 500) -> list:
         return []
 
     try:
-        r = _req.get(
+        r = sn_session.get(
             f"{instance}/api/now/table/{table}",
             auth=(user, password),
-            headers={"Accept": "application/json"},
             params={
                 "sysparm_limit": limit,
                 "sysparm_display_value": "false",
@@ -49,7 +48,7 @@ def fetch_with_fallback(table: str, limit: int = 500) -> list:
             timeout=30,
         )
         if r.status_code == 200:
-            batch = r.json().get("result", [])
+            batch = parse_result(r)
             rows = []
             for rec in batch:
                 row = dict(rec)
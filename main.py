@@ -17,6 +17,7 @@ import requests as _http_requests
 import threading
 import os
 import uuid
+from collections import OrderedDict
 from services.credentials import set_credentials, get_credentials, is_configured
 
 # =====================================================
@@ -74,13 +75,58 @@ from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
 import re as _re
 from datetime import datetime as _dt
 
-from orchestrator import run_all
+from orchestrator import run_all_async, get_agent_results
 from agents import architecture, scripts, performance, security, integration, data_health, upgrade, license_optimization
-from services.sync_service import start_sync_loop, get_sync_status
+from services.sync_service import start_sync_loop, stop_sync_loop, get_sync_status
 from ollama_client import ask_llm
 
 # In-memory job store for async PDF generation
-_pdf_jobs: dict = {}  # job_id -> {"status": "pending"|"done"|"error", "path": ..., "error": ...}
+class LRUJobStore:
+    """
+    Thread-safe job_id -> job dict map that keeps at most `maxsize` entries.
+    The oldest job is evicted first and its PDF (if any) is removed from /tmp.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._jobs: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __setitem__(self, job_id: str, job: dict):
+        evicted = []
+        with self._lock:
+            self._jobs[job_id] = job
+            self._jobs.move_to_end(job_id)
+            while len(self._jobs) > self.maxsize:
+                evicted.append(self._jobs.popitem(last=False)[1])
+        for old in evicted:
+            _remove_pdf(old.get("path"))
+
+    def get(self, job_id: str, default=None):
+        with self._lock:
+            return self._jobs.get(job_id, default)
+
+    def pop(self, job_id: str, default=None):
+        with self._lock:
+            return self._jobs.pop(job_id, default)
+
+
+def _remove_pdf(path):
+    if path:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _discard_pdf_job(job_id: str):
+    """Drop a finished job and its file once the download has been served."""
+    job = _pdf_jobs.pop(job_id)
+    if job:
+        _remove_pdf(job.get("path"))
+
+
+_pdf_jobs = LRUJobStore(maxsize=256)  # job_id -> {"status": "pending"|"done"|"error", "path": ..., "error": ...}
 
 
 # =====================================================
@@ -102,6 +148,7 @@ def _maybe_start_sync(sn_instance: str, sn_user: str, sn_pass: str):
 async def lifespan(app: FastAPI):
     print("✓ ServiceNow AI Copilot starting — waiting for user login to begin sync")
     yield
+    stop_sync_loop()
     print("✓ Application shutdown")
 
 
@@ -345,13 +392,13 @@ def license_optimization_agent(request: Request):
 
 
 @app.api_route("/run-all", methods=["GET", "POST"])
-def run_all_agents(request: Request):
+async def run_all_agents(request: Request):
     sess = _get_session(request)
     if not sess:
         return JSONResponse({"error": "Not authenticated", "auth_required": True}, status_code=401)
     _inject_credentials(sess)
     try:
-        return run_all()
+        return await run_all_async()
     except Exception as e:
         return {"error": str(e)}
 
@@ -665,6 +712,36 @@ def sync_status_endpoint():
 # PDF Helpers
 # =====================================================
 
+# Section order and short labels used by the PDF executive summary
+AGENT_ORDER = [
+    "architecture", "scripts", "performance", "security",
+    "integration", "data_health", "upgrade", "license_optimization"
+]
+
+AGENT_LABELS_SUM = {
+    "architecture": "Architecture",
+    "scripts": "Scripts",
+    "performance": "Performance",
+    "security": "Security",
+    "integration": "Integration",
+    "data_health": "Data Health",
+    "upgrade": "Upgrade",
+    "license_optimization": "Licenses",
+}
+
+# Full section titles used by _agent_section
+AGENT_LABELS = {
+    "architecture": ("Architecture Analysis", ""),
+    "scripts": ("Scripts & Code Quality", ""),
+    "performance": ("Performance Analysis", ""),
+    "security": ("Security Analysis", ""),
+    "integration": ("Integration Health", ""),
+    "data_health": ("Data Health Analysis", ""),
+    "upgrade": ("Upgrade Readiness", ""),
+    "license_optimization": ("License Optimization", ""),
+}
+
+
 def _strip_md(text):
     """Strip markdown syntax for plain PDF text."""
     if not text:
@@ -733,6 +810,17 @@ def _build_pdf_styles():
             fontName="Helvetica-Bold", fontSize=10, textColor=WARNING),
         "risk_low": ParagraphStyle("risk_low",
             fontName="Helvetica-Bold", fontSize=10, textColor=SUCCESS),
+        # Right-aligned "Risk Score" cell of each agent title row, keyed by _risk_label()
+        "risk_score": {
+            lbl: ParagraphStyle(f"rs_{key}", fontName="Helvetica-Bold", fontSize=10,
+                                textColor=col, alignment=TA_RIGHT)
+            for lbl, key, col in (
+                ("High Risk",   "high", DANGER),
+                ("Medium Risk", "med",  WARNING),
+                ("Low Risk",    "low",  SUCCESS),
+                ("N/A",         "na",   GREY),
+            )
+        },
         "BRAND": BRAND, "DARK": DARK, "GREY": GREY,
         "LIGHT": LIGHT, "SUCCESS": SUCCESS, "DANGER": DANGER, "WARNING": WARNING,
     }
@@ -759,62 +847,78 @@ def _risk_label(score):
     return "Low Risk"
 
 
-def _parse_md_line(line, styles):
-    """Convert a markdown line into a ReportLab Paragraph."""
-    line = line.strip()
-    if not line:
-        return None
+# Markdown line kinds returned by _classify_md_line
+MD_EMPTY, MD_H1, MD_H2, MD_H3, MD_NUMBERED, MD_BULLET, MD_BODY = range(7)
+
+# One anchored alternation instead of a regex per kind; the matching group picks the kind
+_MD_PREFIX_RE = _re.compile(r"(?:(###)|(##)|(#)|(\d+\.)|([-*•]))\s")
+_MD_GROUP_KIND = (MD_BODY, MD_H3, MD_H2, MD_H1, MD_NUMBERED, MD_BULLET)
+_MD_HEADINGS = (MD_H1, MD_H2, MD_H3)
+_MD_STYLE = {
+    MD_H1: "section_heading",
+    MD_H2: "h2",
+    MD_H3: "h3",
+    MD_NUMBERED: "numbered",
+    MD_BULLET: "bullet",
+    MD_BODY: "body",
+}
+
+_MD_BOLD_RE = _re.compile(r"\*\*([^*]+)\*\*")
+_MD_CODE_RE = _re.compile(r"`([^`]+)`")
+_MD_AMP_RE  = _re.compile(r"&(?!amp;|lt;|gt;|#)")
+_RL_UNSAFE_RE = _re.compile(r"[<>&]+")
+
+
+def _md_to_rl(t):
+    """Bold/code inline replacement for ReportLab XML."""
+    t = _MD_BOLD_RE.sub(r"<b>\1</b>", t)
+    t = _MD_CODE_RE.sub(r"<font name=\'Courier\'><b>\1</b></font>", t)
+    # Escape bare & not part of entity
+    return _MD_AMP_RE.sub("&amp;", t)
+
 
-    # Bold inline replacement for ReportLab XML
-    def md_to_rl(t):
-        t = _re.sub(r"\*\*([^*]+)\*\*", r"<b>\1</b>", t)
-        t = _re.sub(r"`([^`]+)`", r"<font name=\'Courier\'><b>\1</b></font>", t)
-        # Escape bare & not part of entity
-        t = _re.sub(r"&(?!amp;|lt;|gt;|#)", "&amp;", t)
-        return t
-
-    # H1
-    if _re.match(r"^#\s+", line):
-        text = md_to_rl(line.lstrip("# ").strip())
-        return Paragraph(text, styles["section_heading"])
-    # H2
-    if _re.match(r"^##\s+", line):
-        text = md_to_rl(line.lstrip("# ").strip())
-        return Paragraph(text, styles["h2"])
-    # H3
-    if _re.match(r"^###\s+", line):
-        text = md_to_rl(line.lstrip("# ").strip())
-        return Paragraph(text, styles["h3"])
-    # Numbered list
-    if _re.match(r"^\d+\.\s", line):
-        text = md_to_rl(_re.sub(r"^\d+\.\s*", "", line))
-        return Paragraph(text, styles["numbered"])
-    # Bullet
-    if _re.match(r"^[-*•]\s", line):
-        text = md_to_rl(_re.sub(r"^[-*•]\s*", "", line))
-        return Paragraph(f"• {text}", styles["bullet"])
+def _classify_md_line(line):
+    """
+    Classify a stripped markdown line.
+    Returns (kind, start) where line[start:] is the text after the marker.
+    """
+    if not line:
+        return MD_EMPTY, 0
+    m = _MD_PREFIX_RE.match(line)
+    if not m:
+        return MD_BODY, 0
+    kind = _MD_GROUP_KIND[m.lastindex]
+    if kind in _MD_HEADINGS:
+        return kind, len(line) - len(line.lstrip("# "))
+    return kind, m.end()
+
+
+def _render_md_line(kind, text, styles):
+    """Turn a classified line's text into a ReportLab Paragraph."""
+    text = _md_to_rl(text.strip())
+    style = styles[_MD_STYLE[kind]]
+    if kind == MD_BULLET:
+        return Paragraph(f"• {text}", style)
+    if kind != MD_BODY:
+        return Paragraph(text, style)
     # Regular paragraph
-    text = md_to_rl(line)
     try:
-        return Paragraph(text, styles["body"])
+        return Paragraph(text, style)
     except Exception:
-        safe = _re.sub(r"[<>&]+", "", text)
-        return Paragraph(safe, styles["body"])
+        return Paragraph(_RL_UNSAFE_RE.sub("", text), style)
+
+
+def _parse_md_line(line, styles):
+    """Convert a markdown line into a ReportLab Paragraph."""
+    line = line.strip()
+    kind, start = _classify_md_line(line)
+    if kind == MD_EMPTY:
+        return None
+    return _render_md_line(kind, line[start:], styles)
 
 
 def _agent_section(agent_name, data, styles, elements):
     """Render one agent's results into PDF elements."""
-    AGENT_LABELS = {
-        "architecture": ("Architecture Analysis", ""),
-        "scripts": ("Scripts & Code Quality", ""),
-        "performance": ("Performance Analysis", ""),
-        "security": ("Security Analysis", ""),
-        "integration": ("Integration Health", ""),
-        "data_health": ("Data Health Analysis", ""),
-        "upgrade": ("Upgrade Readiness", ""),
-        "license_optimization": ("License Optimization", ""),
-    }
-
     label, _ = AGENT_LABELS.get(agent_name, (agent_name.replace("_", " ").title(), "•"))
 
     # Section divider
@@ -829,9 +933,7 @@ def _agent_section(agent_name, data, styles, elements):
 
     title_data = [[
         Paragraph(f"<b>{label}</b>", styles["agent_title"]),
-        Paragraph(f"<b>Risk Score: {score_str}</b>",
-                  ParagraphStyle("rs", fontName="Helvetica-Bold", fontSize=10,
-                                 textColor=risk_col, alignment=TA_RIGHT))
+        Paragraph(f"<b>Risk Score: {score_str}</b>", styles["risk_score"][risk_lbl])
     ]]
     title_table = Table(title_data, colWidths=[4*inch, 2.5*inch])
     title_table.setStyle(TableStyle([
@@ -942,53 +1044,31 @@ def _cover_page(styles):
         ["Full", "Instance Analysis"],
         ["Live", "ServiceNow Data"],
     ]
-    kpi_rows = []
-    for val, lbl in summary_items:
-        kpi_rows.append([
-            Paragraph(f"<b>{val}</b>",
-                ParagraphStyle("kv", fontName="Helvetica-Bold", fontSize=22,
-                               textColor=BRAND, alignment=TA_CENTER)),
-            Paragraph(lbl,
-                ParagraphStyle("kl", fontName="Helvetica", fontSize=10,
-                               textColor=styles["GREY"], alignment=TA_CENTER)),
-        ])
-
-    kpi_data = [[
-        Table(kpi_rows, colWidths=[0.8*inch, 1.2*inch]),
-    ] * 3]
-    # 3-column layout
-    flat = []
-    for val, lbl in summary_items:
-        cell = [
-            Paragraph(f"<b>{val}</b>",
-                ParagraphStyle("kv2", fontName="Helvetica-Bold", fontSize=24,
-                               textColor=BRAND, alignment=TA_CENTER, spaceAfter=2)),
-            Paragraph(lbl,
-                ParagraphStyle("kl2", fontName="Helvetica", fontSize=10,
-                               textColor=styles["GREY"], alignment=TA_CENTER)),
-        ]
-        flat.append(cell)
-
-    kpi_table_data = [[
-        [flat[0][0], flat[0][1]],
-        [flat[1][0], flat[1][1]],
-        [flat[2][0], flat[2][1]],
-    ]]
+    kpi_value_style = ParagraphStyle("kv2", fontName="Helvetica-Bold", fontSize=24,
+                                     textColor=BRAND, alignment=TA_CENTER, spaceAfter=2)
+    kpi_label_style = ParagraphStyle("kl2", fontName="Helvetica", fontSize=10,
+                                     textColor=styles["GREY"], alignment=TA_CENTER)
+    flat = [
+        [Paragraph(f"<b>{val}</b>", kpi_value_style), Paragraph(lbl, kpi_label_style)]
+        for val, lbl in summary_items
+    ]
 
+    # 3-column layout: values in row 0, labels in row 1 — one Table, no nesting
     box_table = Table(
-        [[
-            Table([[flat[0][0]], [flat[0][1]]], colWidths=[2*inch]),
-            Table([[flat[1][0]], [flat[1][1]]], colWidths=[2*inch]),
-            Table([[flat[2][0]], [flat[2][1]]], colWidths=[2*inch]),
-        ]],
+        [
+            [flat[0][0], flat[1][0], flat[2][0]],
+            [flat[0][1], flat[1][1], flat[2][1]],
+        ],
         colWidths=[2.1*inch, 2.1*inch, 2.1*inch]
     )
     box_table.setStyle(TableStyle([
         ("BOX", (0,0), (-1,-1), 1, colors.HexColor("#dee2e6")),
-        ("INNERGRID", (0,0), (-1,-1), 0.5, colors.HexColor("#dee2e6")),
+        ("LINEBEFORE", (1,0), (-1,-1), 0.5, colors.HexColor("#dee2e6")),
         ("BACKGROUND", (0,0), (-1,-1), colors.HexColor("#f0f4ff")),
-        ("TOPPADDING", (0,0), (-1,-1), 16),
-        ("BOTTOMPADDING", (0,0), (-1,-1), 16),
+        ("TOPPADDING", (0,0), (-1,0), 16),
+        ("BOTTOMPADDING", (0,0), (-1,0), 3),
+        ("TOPPADDING", (0,1), (-1,1), 3),
+        ("BOTTOMPADDING", (0,1), (-1,1), 16),
         ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
     ]))
     elements.append(box_table)
@@ -1002,7 +1082,6 @@ def _cover_page(styles):
     return elements
 
 
-
 def _build_pdf_in_background(job_id: str):
     """Runs in a background thread: builds PDF and updates job store."""
     try:
@@ -1046,13 +1125,8 @@ def _build_pdf_in_background(job_id: str):
             ))
         elements.append(PageBreak())
 
-        # --- Run all agents in parallel ---
-        results = run_all()
-
-        AGENT_ORDER = [
-            "architecture", "scripts", "performance", "security",
-            "integration", "data_health", "upgrade", "license_optimization"
-        ]
+        # --- Agent results (the report is a snapshot, so a 10-min-old run is fine) ---
+        results = get_agent_results(ttl=600)
 
         # --- Executive Summary Table ---
         elements.append(Paragraph("Executive Summary", styles["section_heading"]))
@@ -1072,17 +1146,6 @@ def _build_pdf_in_background(job_id: str):
             ]
         ]
 
-        AGENT_LABELS_SUM = {
-            "architecture": "Architecture",
-            "scripts": "Scripts",
-            "performance": "Performance",
-            "security": "Security",
-            "integration": "Integration",
-            "data_health": "Data Health",
-            "upgrade": "Upgrade",
-            "license_optimization": "Licenses",
-        }
-
         for key in AGENT_ORDER:
             val = results.get(key, {})
             score = val.get("risk_score")
@@ -1173,7 +1236,7 @@ def report_status(job_id: str):
 
 
 @app.api_route("/download-report/{job_id}", methods=["GET", "POST"])
-def download_report(job_id: str):
+def download_report(job_id: str, background_tasks: BackgroundTasks):
     """Download the completed PDF."""
     job = _pdf_jobs.get(job_id)
     if not job:
@@ -1185,6 +1248,8 @@ def download_report(job_id: str):
     file_path = job["path"]
     if not os.path.exists(file_path):
         return JSONResponse({"error": "PDF file missing on disk"}, status_code=500)
+    # Runs after the response body has been streamed
+    background_tasks.add_task(_discard_pdf_job, job_id)
     return FileResponse(
         file_path,
         filename=f"ServiceNow_AI_Report_{_dt.utcnow().strftime('%Y%m%d_%H%M')}.pdf",
@@ -1203,29 +1268,8 @@ def cfo_dashboard(request: Request):
         return JSONResponse({"error": "Not authenticated", "auth_required": True}, status_code=401)
     _inject_credentials(sess)
     try:
-        # Run ALL agents to collect scores
-        import concurrent.futures
-
-        agent_runners = {
-            "architecture":         architecture.run,
-            "scripts":              scripts.run,
-            "performance":          performance.run,
-            "security":             security.run,
-            "integration":          integration.run,
-            "data_health":          data_health.run,
-            "upgrade":              upgrade.run,
-            "license_optimization": license_optimization.run,
-        }
-
-        agent_results = {}
-        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as ex:
-            future_map = {ex.submit(fn): name for name, fn in agent_runners.items()}
-            for future in concurrent.futures.as_completed(future_map):
-                name = future_map[future]
-                try:
-                    agent_results[name] = future.result()
-                except Exception as e:
-                    agent_results[name] = {"error": str(e), "risk_score": None}
+        # Run ALL agents to collect scores (shared with the PDF report path)
+        agent_results = get_agent_results()
 
         # License data
         lic = agent_results.get("license_optimization", {})
@@ -1241,18 +1285,6 @@ def cfo_dashboard(request: Request):
         current_cost       = financials.get("current_monthly_cost", summary.get("current_monthly_cost", 0))
         optimized_cost     = max(current_cost - monthly_savings, 0)
 
-        # Agent risk scores
-        AGENT_LABELS = {
-            "architecture":         "Architecture",
-            "scripts":              "Scripts",
-            "performance":          "Performance",
-            "security":             "Security",
-            "integration":          "Integration",
-            "data_health":          "Data Health",
-            "upgrade":              "Upgrade",
-            "license_optimization": "Licenses",
-        }
-
         import re as _re2
 
         def _safe_extract_score(res):
@@ -1280,7 +1312,7 @@ def cfo_dashboard(request: Request):
             return None
 
         agent_scores = []
-        for key, label in AGENT_LABELS.items():
+        for key, label in AGENT_LABELS_SUM.items():
             res = agent_results.get(key, {})
             if not isinstance(res, dict):
                 res = {}
@@ -12,13 +12,29 @@
 #     return r.json().get("response", "")
 
 import os
+import httpx
 from openai import OpenAI
 
+# HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 keep-alive without it
+try:
+    import h2  # noqa: F401
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
 NVIDIA_API_KEY = os.environ.get("NVIDIA_API_KEY", "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")
 MODEL = "mistralai/devstral-2-123b-instruct-2512"
+BASE_URL = "https://integrate.api.nvidia.com/v1"
+
+# Module-wide connection pools: the 8 parallel agents reuse warm TCP/TLS connections
+_LIMITS  = httpx.Limits(max_keepalive_connections=16, max_connections=32)
+_TIMEOUT = httpx.Timeout(120.0)
+_http_client  = httpx.Client(http2=_HTTP2, limits=_LIMITS, timeout=_TIMEOUT)
+
 client = OpenAI(
-    base_url="https://integrate.api.nvidia.com/v1",
+    base_url=BASE_URL,
     api_key=NVIDIA_API_KEY,
+    http_client=_http_client,
 )
 
 
@@ -41,4 +57,5 @@ def ask_llm(prompt: str, temperature: float = 0.15, top_p: float = 0.95, max_tok
         if chunk.choices and chunk.choices[0].delta.content:
             result.append(chunk.choices[0].delta.content)
 
-    return "".join(result)
\ No newline at end of file
+    return "".join(result)
+
@@ -1,5 +1,9 @@
 from agents import architecture, scripts, performance, security, integration, data_health, upgrade, license_optimization
+from services.credentials import get_credentials
 from concurrent.futures import ThreadPoolExecutor, as_completed
+import asyncio
+import threading
+import time
 
 AGENTS = {
     "architecture": architecture.run,
@@ -12,15 +16,75 @@ AGENTS = {
     "license_optimization": license_optimization.run,
 }
 
+# One pool for the whole process — threads are spawned once and reused by every run
+_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="agent")
+
 def run_all():
     """Run all agents in parallel for maximum speed."""
     results = {}
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        future_to_key = {executor.submit(fn): key for key, fn in AGENTS.items()}
-        for future in as_completed(future_to_key):
-            key = future_to_key[future]
-            try:
-                results[key] = future.result()
-            except Exception as e:
-                results[key] = {"error": str(e), "risk_score": None, "total_records": 0}
-    return results
\ No newline at end of file
+    future_to_key = {_EXECUTOR.submit(fn): key for key, fn in AGENTS.items()}
+    for future in as_completed(future_to_key):
+        key = future_to_key[future]
+        try:
+            results[key] = future.result()
+        except Exception as e:
+            results[key] = {"error": str(e), "risk_score": None, "total_records": 0}
+    return results
+
+
+# Last clean run_all() snapshot per ServiceNow instance, shared by the dashboard
+# and PDF report paths. _results_lock only guards the two dicts and is never
+# held during a run; each instance has its own run lock.
+_results_lock  = threading.Lock()
+_results_cache = {}   # instance -> (time.monotonic(), results)
+_run_locks     = {}   # instance -> threading.Lock
+
+def _has_errors(results):
+    return any(isinstance(r, dict) and r.get("error") for r in results.values())
+
+def get_agent_results(ttl: float = 300):
+    """
+    Return run_all() results, reusing the last run if it is younger than `ttl`
+    seconds and was taken against the same ServiceNow instance.
+    Concurrent callers for one instance wait for a single in-flight run instead
+    of starting their own; other instances are not blocked. A run in which any
+    agent errored is returned but not cached, so a transient failure isn't
+    served to later callers.
+    """
+    instance = get_credentials().get("instance", "")
+    with _results_lock:
+        run_lock = _run_locks.setdefault(instance, threading.Lock())
+
+    with run_lock:
+        with _results_lock:
+            hit = _results_cache.get(instance)
+        if hit is not None and time.monotonic() - hit[0] < ttl:
+            return hit[1]
+
+        results = run_all()
+        if not _has_errors(results):
+            with _results_lock:
+                _results_cache[instance] = (time.monotonic(), results)
+        return results
+
+
+async def run_all_async():
+    """
+    Async twin of run_all() for use from `async def` routes: the agents (all
+    synchronous, blocking on ask_llm) run on the shared _EXECUTOR while the
+    event loop stays free to serve other requests.
+    """
+    loop = asyncio.get_running_loop()
+    keys = list(AGENTS)
+    outcomes = await asyncio.gather(
+        *(loop.run_in_executor(_EXECUTOR, AGENTS[k]) for k in keys),
+        return_exceptions=True,
+    )
+
+    results = {}
+    for key, outcome in zip(keys, outcomes):
+        if isinstance(outcome, Exception):
+            results[key] = {"error": str(outcome), "risk_score": None, "total_records": 0}
+        else:
+            results[key] = outcome
+    return results
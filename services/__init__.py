@@ -1,7 +1,15 @@
-from . import database, servicenow_client, sync_service
+import importlib
 
 __all__ = [
     'database',
     'servicenow_client',
     'sync_service'
 ]
+
+
+def __getattr__(name):
+    # Submodules load on first access, so `from services.database import …`
+    # (e.g. from setup.py) doesn't also pull in the ServiceNow client and sync loop
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
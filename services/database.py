@@ -14,12 +14,31 @@ Key differences from MySQL build:
   • LONGTEXT        : replaced with TEXT  (Postgres has no LONGTEXT)
 """
 
+import csv
+import functools
+import io
 import json
 import os
 import re
+import threading
+import uuid
 import psycopg2
 import psycopg2.extras
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from psycopg2.pool import ThreadedConnectionPool
+
+# orjson is an optional accelerator — same JSON, serialized in C
+try:
+    import orjson
+
+    def _json_dumps(v) -> str:
+        return orjson.dumps(v).decode()
+except ImportError:
+    orjson = None
+
+    def _json_dumps(v) -> str:
+        return json.dumps(v, ensure_ascii=False)
 
 # ─────────────────────────────────────────────────────────────
 # Connection — reads DATABASE_URL injected by Render
@@ -38,31 +57,112 @@ def _fix_scheme(url: str) -> str:
     return url
 
 
+# Shared pool — one TCP+TLS+auth handshake per pooled connection, not per call.
+# psycopg2 closes any returned connection beyond minconn, so minconn is the number
+# kept warm; it defaults to the max so the 8 agents reading in parallel all reuse.
+# Connections are still opened on demand (see _pool), not all at start-up.
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "10"))
+PG_POOL_MIN = min(int(os.getenv("PG_POOL_MIN", str(PG_POOL_MAX))), PG_POOL_MAX)
+
+_POOL       = None
+_POOL_PID   = None
+_POOL_SLOTS = None
+_POOL_LOCK  = threading.Lock()
+
+
+def _pool():
+    """
+    Return the process-wide ThreadedConnectionPool, creating it on first use.
+    A forked child (new PID) gets its own pool — sockets must not be shared.
+    """
+    global _POOL, _POOL_PID, _POOL_SLOTS
+    pid = os.getpid()
+    if _POOL is None or _POOL_PID != pid:
+        with _POOL_LOCK:
+            if _POOL is None or _POOL_PID != pid:
+                url = _fix_scheme(DATABASE_URL)
+                if not url:
+                    raise RuntimeError(
+                        "DATABASE_URL is not set. "
+                        "Add it in Render → your service → Environment."
+                    )
+                # psycopg2 connects minconn times in __init__; start from one and
+                # raise minconn afterwards, so the pool only grows to real concurrency
+                # but keeps up to PG_POOL_MIN idle connections once it has them
+                _POOL       = ThreadedConnectionPool(1, PG_POOL_MAX, url, sslmode="require")
+                _POOL.minconn = PG_POOL_MIN
+                # ThreadedConnectionPool raises when exhausted; make callers wait instead
+                _POOL_SLOTS = threading.BoundedSemaphore(PG_POOL_MAX)
+                _POOL_PID   = pid
+    return _POOL
+
+
+@contextmanager
 def get_conn():
-    url = _fix_scheme(DATABASE_URL)
-    if not url:
-        raise RuntimeError(
-            "DATABASE_URL is not set. "
-            "Add it in Render → your service → Environment."
-        )
-    return psycopg2.connect(url, sslmode="require")
+    """
+    Check a connection out of the pool for the duration of a `with` block.
+    putconn() rolls back anything left uncommitted and drops closed connections.
+    """
+    pool  = _pool()
+    slots = _POOL_SLOTS
+    slots.acquire()
+    try:
+        conn = pool.getconn()
+        try:
+            yield conn
+        finally:
+            pool.putconn(conn)
+    finally:
+        slots.release()
+
+
+# Long-lived per-thread connections for the sync workers. Those threads live
+# for the whole process, so they skip pool checkout entirely.
+_TL = threading.local()
+
+
+def sync_conn():
+    """Return the calling thread's own connection, opening it on first use."""
+    conn = getattr(_TL, "conn", None)
+    if conn is None or conn.closed or getattr(_TL, "pid", None) != os.getpid():
+        url = _fix_scheme(DATABASE_URL)
+        if not url:
+            raise RuntimeError(
+                "DATABASE_URL is not set. "
+                "Add it in Render → your service → Environment."
+            )
+        conn    = psycopg2.connect(url, sslmode="require")
+        _TL.conn = conn
+        _TL.pid  = os.getpid()
+    return conn
+
+
+def drop_sync_conn():
+    """Close and forget the calling thread's connection (e.g. after it broke)."""
+    conn, _TL.conn = getattr(_TL, "conn", None), None
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
 
 
 # ─────────────────────────────────────────────────────────────
 # Flatten nested ServiceNow reference fields
 # ─────────────────────────────────────────────────────────────
 
-def flatten_record(record: dict) -> dict:
+def flatten_record(record: dict, _dict=dict, _list=list, _dumps=_json_dumps) -> dict:
+    # Hot loop: exact type() checks skip isinstance's MRO walk, and the
+    # default-arg bindings turn global lookups into local ones.
     flat = {}
     for k, v in record.items():
-        if isinstance(v, dict):
+        t = type(v)
+        if t is _dict:
             flat[k] = v.get("value") or v.get("display_value") or ""
-        elif isinstance(v, list):
-            flat[k] = json.dumps(v, ensure_ascii=False)
-        elif v is None:
-            flat[k] = None
+        elif t is _list:
+            flat[k] = _dumps(v)
         else:
-            flat[k] = v
+            flat[k] = v  # includes None
     return flat
 
 
@@ -70,12 +170,17 @@ def flatten_record(record: dict) -> dict:
 # Column name safety
 # ─────────────────────────────────────────────────────────────
 
+_COL_RE = re.compile(r"^[a-z0-9_]{1,63}$")
+
+
+# ServiceNow field names are a small fixed set, so nearly every call is a cache hit
+@functools.lru_cache(maxsize=4096)
 def sanitize_col(name: str):
     """Return a safe, lowercase column name or None if invalid."""
     if not name:
         return None
     name = name.strip().lower()          # Postgres folds unquoted names to lower
-    if not re.match(r"^[a-z0-9_]{1,63}$", name):
+    if not _COL_RE.match(name):
         return None
     return name
 
@@ -94,6 +199,45 @@ def _ensure_sync_table(cursor):
     """)
 
 
+# In-process mirror of table_sync_state. Only this process advances watermarks,
+# so after the first read per table the DB round-trip can be skipped.
+_WATERMARK_LOCK = threading.Lock()
+_WATERMARKS: dict = {}   # table -> last_sys_updated_on string (None = no watermark yet)
+
+
+def _remember_watermark(table: str, timestamp):
+    """Record a committed watermark in the in-process cache."""
+    with _WATERMARK_LOCK:
+        _WATERMARKS[table] = timestamp
+
+
+def reset_watermark(table: str):
+    """
+    Point the cached watermark for `table` back at table_sync_state, which
+    only holds safe watermarks — completed FULL passes and in-order DELTA
+    pages (None → next sync is FULL). Used after an interrupted full load,
+    whose rows (in sys_id order) say nothing about which timestamps are
+    complete — so the cached-rows floor in get_last_timestamp must not be
+    consulted either.
+    """
+    stored = None
+    try:
+        with get_conn() as db:
+            cursor = db.cursor()
+            _ensure_sync_table(cursor)
+            cursor.execute(
+                "SELECT last_sys_updated_on FROM table_sync_state WHERE table_name = %s",
+                (table,),
+            )
+            row = cursor.fetchone()
+            db.commit()
+            cursor.close()
+        stored = row[0] if row else None
+    except Exception as e:
+        print(f"[db] reset_watermark error on {table}: {e}")
+    _remember_watermark(table, stored)
+
+
 def _update_watermark(cursor, table: str, timestamp: str):
     if not timestamp:
         return
@@ -107,35 +251,150 @@ def _update_watermark(cursor, table: str, timestamp: str):
     """, (table, timestamp))
 
 
+def flush_watermarks(pairs):
+    """
+    Persist a sync cycle's watermarks in one multi-row upsert, then advance
+    the in-process cache to match.
+    `pairs` is an iterable of (table, last_sys_updated_on); empty timestamps
+    are ignored, and a watermark is never moved backwards (a /fix-it push
+    may have advanced it mid-cycle).
+    """
+    latest = {}
+    for table, ts in pairs:
+        if ts and (table not in latest or ts > latest[table]):
+            latest[table] = ts
+    if not latest:
+        return
+
+    try:
+        with get_conn() as db:
+            cursor = db.cursor()
+            _ensure_sync_table(cursor)
+            psycopg2.extras.execute_values(cursor, """
+                INSERT INTO table_sync_state (table_name, last_sys_updated_on)
+                VALUES %s
+                ON CONFLICT (table_name)
+                DO UPDATE SET last_sys_updated_on = EXCLUDED.last_sys_updated_on
+                WHERE table_sync_state.last_sys_updated_on IS NULL
+                   OR table_sync_state.last_sys_updated_on < EXCLUDED.last_sys_updated_on
+            """, list(latest.items()))
+            db.commit()
+            cursor.close()
+    except Exception as e:
+        print(f"[db] watermark flush error: {e}")
+        return
+
+    with _WATERMARK_LOCK:
+        for table, ts in latest.items():
+            cached = _WATERMARKS.get(table)
+            if not cached or ts > cached:
+                _WATERMARKS[table] = ts
+
+
 # ─────────────────────────────────────────────────────────────
 # Auto-create / auto-expand dynamic tables
 # ─────────────────────────────────────────────────────────────
 
+# Schema cache: synced tables are only ever created/altered from this module,
+# so what we have seen once stays true until we change it ourselves.
+_SCHEMA_LOCK  = threading.Lock()
+_TABLES_READY: set  = set()
+_TABLE_COLS:   dict = {}   # table -> set of known column names
+
+
+def _forget_schema(table: str):
+    """Drop cached schema for `table` (e.g. after a rolled-back transaction)."""
+    with _SCHEMA_LOCK:
+        _TABLES_READY.discard(table)
+        _TABLE_COLS.pop(table, None)
+
+
+# Columns stored as timestamptz rather than TEXT — indexed and compared as real times
+_TIMESTAMP_COLS = frozenset({"sys_updated_on"})
+
+
+def _col_type(col: str) -> str:
+    return "timestamptz" if col in _TIMESTAMP_COLS else "TEXT"
+
+
+def _to_timestamptz(v):
+    """ServiceNow 'YYYY-MM-DD HH:MM:SS' (always UTC with display_value=false) → aware datetime."""
+    if not v:
+        return None   # '' is "never updated", not a time
+    if isinstance(v, datetime):
+        return v if v.tzinfo else v.replace(tzinfo=timezone.utc)
+    try:
+        return datetime.fromisoformat(str(v)[:19]).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def _ensure_sys_updated_on(cursor, table: str):
+    """
+    Make sure sys_updated_on exists as timestamptz (converting tables created
+    when every column was TEXT) and is indexed for max()/range scans.
+    """
+    cursor.execute(
+        "SELECT data_type FROM information_schema.columns "
+        "WHERE table_name = %s AND column_name = 'sys_updated_on'",
+        (table,),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        cursor.execute(f'ALTER TABLE "{table}" ADD COLUMN IF NOT EXISTS "sys_updated_on" timestamptz')
+    elif row[0] != "timestamp with time zone":
+        # Savepoint: a bad legacy value must not abort the caller's transaction
+        cursor.execute("SAVEPOINT sys_updated_on_type")
+        try:
+            cursor.execute(
+                f'ALTER TABLE "{table}" ALTER COLUMN "sys_updated_on" TYPE timestamptz '
+                f"USING NULLIF(\"sys_updated_on\", '')::timestamp AT TIME ZONE 'UTC'"
+            )
+            cursor.execute("RELEASE SAVEPOINT sys_updated_on_type")
+        except Exception as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT sys_updated_on_type")
+            print(f"[db] {table}.sys_updated_on left as {row[0]}: {e}")
+    cursor.execute(
+        f'CREATE INDEX IF NOT EXISTS "{table}_sysupd_idx" ON "{table}" ("sys_updated_on" DESC)'
+    )
+
+
 def _ensure_table(cursor, table: str, flat_row: dict):
     """
     Create the table if it doesn't exist yet.
-    Uses double-quoted identifiers and TEXT columns (no LONGTEXT in Postgres).
+    Uses double-quoted identifiers and TEXT columns (no LONGTEXT in Postgres),
+    except sys_updated_on, which is an indexed timestamptz.
     """
-    col_defs = ['"sys_id" TEXT PRIMARY KEY']
+    if table in _TABLES_READY:
+        return
+    col_defs = ['"sys_id" TEXT PRIMARY KEY', '"sys_updated_on" timestamptz']
     for k in flat_row:
         safe = sanitize_col(k)
-        if safe and safe != "sys_id":
-            col_defs.append(f'"{safe}" TEXT')
+        if safe and safe not in ("sys_id", "sys_updated_on"):
+            col_defs.append(f'"{safe}" {_col_type(safe)}')
     cursor.execute(
         f'CREATE TABLE IF NOT EXISTS "{table}" ({", ".join(col_defs)})'
     )
+    _ensure_sys_updated_on(cursor, table)
+    with _SCHEMA_LOCK:
+        _TABLES_READY.add(table)
 
 
 def _ensure_columns(cursor, table: str, flat_row: dict):
     """
     Add any columns that are present in flat_row but not yet in the table.
-    Uses information_schema instead of MySQL's SHOW COLUMNS.
+    Uses information_schema instead of MySQL's SHOW COLUMNS — once per table,
+    after which the known column set is served from _TABLE_COLS.
     """
-    cursor.execute(
-        "SELECT column_name FROM information_schema.columns WHERE table_name = %s",
-        (table,),
-    )
-    existing = {row[0] for row in cursor.fetchall()}
+    existing = _TABLE_COLS.get(table)
+    if existing is None:
+        cursor.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = %s",
+            (table,),
+        )
+        found = {row[0] for row in cursor.fetchall()}
+        with _SCHEMA_LOCK:
+            existing = _TABLE_COLS.setdefault(table, found)
 
     for k in flat_row:
         safe = sanitize_col(k)
@@ -143,9 +402,10 @@ def _ensure_columns(cursor, table: str, flat_row: dict):
             try:
                 # ADD COLUMN IF NOT EXISTS is safe in Postgres 9.6+
                 cursor.execute(
-                    f'ALTER TABLE "{table}" ADD COLUMN IF NOT EXISTS "{safe}" TEXT'
+                    f'ALTER TABLE "{table}" ADD COLUMN IF NOT EXISTS "{safe}" {_col_type(safe)}'
                 )
-                existing.add(safe)
+                with _SCHEMA_LOCK:
+                    existing.add(safe)
             except Exception:
                 pass
 
@@ -154,84 +414,195 @@ def _ensure_columns(cursor, table: str, flat_row: dict):
 # Upsert records + advance watermark
 # ─────────────────────────────────────────────────────────────
 
-def upsert_records(table: str, records: list, max_seen_ts=None):
+# Buckets at least this large go through COPY instead of execute_values
+COPY_THRESHOLD = 500
+# NULL marker for COPY — CSV cannot otherwise tell NULL from an empty string
+_COPY_NULL = r"\N"
+
+
+def _on_conflict(cols) -> str:
+    """ON CONFLICT action for an upsert over `cols`: update all columns except the PK."""
+    update_cols = [c for c in cols if c != "sys_id"]
+    if not update_cols:
+        return "DO NOTHING"
+    return "DO UPDATE SET " + ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in update_cols)
+
+
+@functools.lru_cache(maxsize=1024)
+def _upsert_sql(table: str, cols: tuple) -> str:
+    """execute_values INSERT … ON CONFLICT for one column signature — built once, reused."""
+    col_list = ", ".join(f'"{c}"' for c in cols)
+    return (
+        f'INSERT INTO "{table}" ({col_list}) VALUES %s '
+        f'ON CONFLICT ("sys_id") {_on_conflict(cols)}'
+    )
+
+
+def _copy_value(v):
+    """Render one upsert value as a COPY CSV field."""
+    return _COPY_NULL if v is None else v
+
+
+def _bulk_upsert_via_copy(cursor, table: str, cols: tuple, rows: list):
+    """
+    Large-batch upsert: stream rows into a temp staging table with COPY,
+    then merge them with a single INSERT … SELECT … ON CONFLICT.
+    """
+    buf    = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow([_copy_value(v) for v in row])
+    buf.seek(0)
+
+    col_list = ", ".join(f'"{c}"' for c in cols)
+    # Several buckets may be copied in one transaction — start each from a fresh _stg.
+    # Always pg_temp-qualified: unqualified, a DROP with no temp _stg yet would
+    # resolve through search_path and could drop a permanent public._stg.
+    cursor.execute("DROP TABLE IF EXISTS pg_temp._stg")
+    cursor.execute(
+        f'CREATE TEMP TABLE _stg (LIKE "{table}" INCLUDING DEFAULTS) ON COMMIT DROP'
+    )
+    cursor.copy_expert(
+        f"COPY pg_temp._stg ({col_list}) FROM STDIN WITH (FORMAT CSV, NULL '{_COPY_NULL}')",
+        buf,
+    )
+    cursor.execute(
+        f'INSERT INTO "{table}" ({col_list}) SELECT {col_list} FROM pg_temp._stg '
+        f'ON CONFLICT ("sys_id") {_on_conflict(cols)}'
+    )
+
+class UpsertError(Exception):
+    """Some rows of a batch could not be written (the rest were committed)."""
+
+
+def upsert_records(table: str, records: list, max_seen_ts=None, defer_watermark=False) -> int:
+    """
+    upsert_records_with() on a connection checked out of the pool.
+    Returns 0 instead of raising UpsertError.
+    """
+    if not records:
+        return 0
+    try:
+        with get_conn() as db:
+            return upsert_records_with(db, table, records, max_seen_ts, defer_watermark)
+    except UpsertError:
+        return 0
+
+
+def upsert_records_with(db, table: str, records: list, max_seen_ts=None, defer_watermark=False) -> int:
     """
     Upsert a batch of ServiceNow records into Postgres.
 
     MySQL used:   REPLACE INTO `table` (…) VALUES (…)
-    Postgres uses: INSERT INTO "table" (…) VALUES (…)
+    Postgres uses: INSERT INTO "table" (…) VALUES %s
                    ON CONFLICT ("sys_id") DO UPDATE SET col = EXCLUDED.col, …
-    """
-    if not records:
-        return
 
-    db     = get_conn()
-    cursor = db.cursor()
-    highest_ts = max_seen_ts
+    Records are grouped by their column set. Small groups are sent as one
+    multi-row INSERT via execute_values (page_size=1000); groups of
+    COPY_THRESHOLD rows or more go through _bulk_upsert_via_copy.
 
-    for record in records:
-        if not record or not isinstance(record, dict):
-            continue
+    The watermark is written in the same transaction and cached unless
+    defer_watermark is set, in which case it is neither — the caller decides
+    when a watermark is safe and persists it via flush_watermarks.
 
-        flat = flatten_record(record)
-        _ensure_table(cursor, table, flat)
-        _ensure_columns(cursor, table, flat)
+    `db` is any open connection; the batch is committed on it before returning
+    and it is rolled back if anything escapes, so it is safe to reuse. Each
+    column group runs under its own savepoint: a failing group is rolled back
+    while the others commit, and UpsertError is raised with the watermark
+    left untouched.
 
-        cols         = []
-        placeholders = []
-        values       = []
+    Returns the number of rows inserted or updated (summed cursor.rowcount).
+    """
+    if not records:
+        return 0
 
+    flats = [flatten_record(r) for r in records if r and isinstance(r, dict)]
+    if not flats:
+        return 0
+
+    # Track the highest sys_updated_on seen in this batch
+    highest_ts = max_seen_ts
+    if not highest_ts:
+        for flat in flats:
+            ts = flat.get("sys_updated_on")
+            if ts and (not highest_ts or ts > highest_ts):
+                highest_ts = ts
+
+    # Bucket rows by column signature; within a bucket the last copy of a sys_id wins
+    # (a single INSERT … ON CONFLICT cannot touch the same row twice)
+    # flatten_record leaves no dict/list behind, so only bools need coercing —
+    # Postgres has a real BOOLEAN type; keep as string for TEXT col.
+    # Identity checks, not a dict lookup: 1 == True would map ints too.
+    buckets = {}
+    for flat in flats:
+        row = {}
         for k, v in flat.items():
             safe = sanitize_col(k)
             if not safe:
                 continue
-            cols.append(f'"{safe}"')
-            placeholders.append("%s")
-
-            if isinstance(v, (dict, list)):
-                values.append(json.dumps(v, ensure_ascii=False))
-            elif isinstance(v, bool):
-                # Postgres has a real BOOLEAN type; keep as string for TEXT col
-                values.append("true" if v else "false")
+            if v is True:
+                row[safe] = "true"
+            elif v is False:
+                row[safe] = "false"
+            elif safe in _TIMESTAMP_COLS:
+                row[safe] = _to_timestamptz(v)
             else:
-                values.append(v)
-
-        if not cols:
+                row[safe] = v
+        if not row:
             continue
+        cols = tuple(sorted(row))
+        buckets.setdefault(cols, {})[row.get("sys_id")] = tuple(row[c] for c in cols)
 
-        # Build the ON CONFLICT update list for all columns except the PK
-        update_cols = [c for c in cols if c != '"sys_id"']
-        if update_cols:
-            set_clause = ", ".join(f"{c} = EXCLUDED.{c}" for c in update_cols)
-            sql = (
-                f'INSERT INTO "{table}" ({", ".join(cols)}) '
-                f'VALUES ({", ".join(placeholders)}) '
-                f'ON CONFLICT ("sys_id") DO UPDATE SET {set_clause}'
-            )
-        else:
-            sql = (
-                f'INSERT INTO "{table}" ({", ".join(cols)}) '
-                f'VALUES ({", ".join(placeholders)}) '
-                f'ON CONFLICT ("sys_id") DO NOTHING'
-            )
+    cursor = db.cursor()
+    try:
+        # Schema work once per batch, over the union of every column seen
+        all_cols = dict.fromkeys(c for cols in buckets for c in cols)
+        _ensure_table(cursor, table, all_cols)
+        _ensure_columns(cursor, table, all_cols)
+
+        failed   = False
+        affected = 0
+        for cols, rows in buckets.items():
+            rows = list(rows.values())
+            # A savepoint per bucket: one bad bucket is rolled back on its own
+            # instead of aborting the transaction for the schema work and the rest
+            cursor.execute("SAVEPOINT upsert_bucket")
+            try:
+                if len(rows) >= COPY_THRESHOLD:
+                    _bulk_upsert_via_copy(cursor, table, cols, rows)
+                else:
+                    # Below COPY_THRESHOLD this is a single page, so rowcount covers every row
+                    psycopg2.extras.execute_values(
+                        cursor, _upsert_sql(table, cols), rows, page_size=1000
+                    )
+                affected += max(cursor.rowcount, 0)
+                cursor.execute("RELEASE SAVEPOINT upsert_bucket")
+            except Exception as e:
+                print(f"[db] upsert error in {table}: {e}")
+                cursor.execute("ROLLBACK TO SAVEPOINT upsert_bucket")
+                failed = True
+
+        # Rows are missing if a bucket failed, so the watermark must not move past them
+        if highest_ts and not defer_watermark and not failed:
+            _update_watermark(cursor, table, highest_ts)
 
+        db.commit()
+    except Exception:
+        _forget_schema(table)
         try:
-            cursor.execute(sql, values)
-        except Exception as e:
-            print(f"[db] upsert error in {table}: {e}")
-
-        # Track the highest sys_updated_on seen in this batch
-        if not highest_ts:
-            ts = flat.get("sys_updated_on")
-            if ts and (not highest_ts or ts > highest_ts):
-                highest_ts = ts
-
-    if highest_ts:
-        _update_watermark(cursor, table, highest_ts)
+            db.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        cursor.close()
 
-    db.commit()
-    cursor.close()
-    db.close()
+    # Only cache a watermark for a batch that landed in full
+    if failed:
+        raise UpsertError(f"upsert into {table} failed for part of the batch")
+    if highest_ts and not defer_watermark:
+        _remember_watermark(table, highest_ts)
+    return affected
 
 
 # ─────────────────────────────────────────────────────────────
@@ -239,62 +610,103 @@ def upsert_records(table: str, records: list, max_seen_ts=None):
 # ─────────────────────────────────────────────────────────────
 
 def get_last_timestamp(table: str):
+    with _WATERMARK_LOCK:
+        hit    = table in _WATERMARKS
+        cached = _WATERMARKS.get(table)
+    if hit:
+        return _parse_watermark(cached)
+
     try:
-        db     = get_conn()
-        cursor = db.cursor()
-        _ensure_sync_table(cursor)
-        db.commit()   # make sure CREATE TABLE IF NOT EXISTS is visible
+        with get_conn() as db:
+            cursor = db.cursor()
+            _ensure_sync_table(cursor)
+            db.commit()   # make sure CREATE TABLE IF NOT EXISTS is visible
+
+            cursor.execute(
+                "SELECT last_sys_updated_on FROM table_sync_state WHERE table_name = %s",
+                (table,),
+            )
+            row = cursor.fetchone()
+            timestamp = row[0] if row else None
 
-        cursor.execute(
-            "SELECT last_sys_updated_on FROM table_sync_state WHERE table_name = %s",
-            (table,),
-        )
-        row = cursor.fetchone()
-        cursor.close()
-        db.close()
+            # The cached rows themselves bound the watermark from below — covers a
+            # cycle whose flush_watermarks never ran. Index-backed via _sysupd_idx.
+            try:
+                cursor.execute("SELECT to_regclass(%s)", (f'"{table}"',))
+                if cursor.fetchone()[0]:
+                    cursor.execute(
+                        f"SELECT to_char(max(\"sys_updated_on\") AT TIME ZONE 'UTC', "
+                        f"'YYYY-MM-DD HH24:MI:SS') FROM \"{table}\""
+                    )
+                    newest = cursor.fetchone()[0]
+                    if newest and (not timestamp or newest > timestamp[:19]):
+                        timestamp = newest
+            except Exception:
+                db.rollback()   # e.g. sys_updated_on still TEXT — keep the stored watermark
+            cursor.close()
 
-        if not row or not row[0]:
-            return None
-        return datetime.strptime(row[0][:19], "%Y-%m-%d %H:%M:%S")
+        _remember_watermark(table, timestamp)
+        return _parse_watermark(timestamp)
 
     except Exception:
         return None
 
 
+def _parse_watermark(timestamp):
+    if not timestamp:
+        return None
+    return datetime.strptime(timestamp[:19], "%Y-%m-%d %H:%M:%S")
+
+
 # ─────────────────────────────────────────────────────────────
 # Read helpers
 # ─────────────────────────────────────────────────────────────
 
-def fetch_cached(table: str, limit=None):
+FETCH_ITERSIZE = 2000   # rows per server-side cursor round-trip
+
+def fetch_cached_iter(table: str, limit=None, with_data=False):
     """
-    Return all (or limited) rows from a synced table as a list of dicts.
-    Uses RealDictCursor instead of MySQL's  cursor(dictionary=True).
+    Stream rows from a synced table as dicts without loading the table into RAM.
+    Uses a named (server-side) RealDictCursor that pulls FETCH_ITERSIZE rows per
+    round-trip; the pooled connection is held until the generator is exhausted
+    or closed.
+
+    with_data=True adds a legacy "data" key holding the row as a JSON string.
+    It costs one json.dumps per row, so only callers that read it should ask.
     """
-    try:
-        db     = get_conn()
+    with get_conn() as db:
         # RealDictCursor returns rows as real Python dicts
-        cursor = db.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor = db.cursor(
+            name=f"cur_{table}_{uuid.uuid4().hex[:8]}",
+            cursor_factory=psycopg2.extras.RealDictCursor,
+        )
+        cursor.itersize = FETCH_ITERSIZE
+        try:
+            # Double-quote the table name; %s placeholder for the LIMIT value
+            if limit is not None:
+                cursor.execute(f'SELECT * FROM "{table}" LIMIT %s', (limit,))
+            else:
+                cursor.execute(f'SELECT * FROM "{table}"')
 
-        # Double-quote the table name; %s placeholder for the LIMIT value
-        if limit is not None:
-            cursor.execute(f'SELECT * FROM "{table}" LIMIT %s', (limit,))
-        else:
-            cursor.execute(f'SELECT * FROM "{table}"')
+            for row in cursor:
+                if not row:
+                    continue
+                row_dict = dict(row)
+                # stdlib json on purpose: agents substring-match its '"key": value' spacing
+                if with_data and "data" not in row_dict:
+                    row_dict["data"] = json.dumps(row_dict, ensure_ascii=False, default=str)
+                yield row_dict
+        finally:
+            cursor.close()
 
-        rows = cursor.fetchall()
-        cursor.close()
-        db.close()
-
-        result = []
-        for row in rows:
-            if not row:
-                continue
-            row_dict = dict(row)
-            if "data" not in row_dict:
-                row_dict["data"] = json.dumps(row_dict, ensure_ascii=False, default=str)
-            result.append(row_dict)
-        return result
 
+def fetch_cached(table: str, limit=None, with_data=False):
+    """
+    Return all (or limited) rows from a synced table as a list of dicts.
+    List-building wrapper around fetch_cached_iter(); returns [] on any DB error.
+    """
+    try:
+        return list(fetch_cached_iter(table, limit=limit, with_data=with_data))
     except Exception as e:
         print(f"[db] fetch_cached error on {table}: {e}")
         return []
@@ -304,14 +716,49 @@ def fetch_cached(table: str, limit=None):
 # Row count
 # ─────────────────────────────────────────────────────────────
 
+def get_table_estimate(table: str) -> int:
+    """
+    Approximate row count from planner statistics (pg_class.reltuples).
+    O(1) instead of COUNT(*)'s full scan; only as fresh as the last (auto)ANALYZE,
+    so never-analyzed tables (reltuples = -1) fall back to an exact count.
+    """
+    try:
+        with get_conn() as db:
+            cursor = db.cursor()
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)",
+                (f'"{table}"',),
+            )
+            row = cursor.fetchone()
+            cursor.close()
+    except Exception:
+        return 0
+    if not row or row[0] is None:
+        return 0
+    if row[0] < 0:
+        return get_table_count(table)
+    return row[0]
+
+
+def analyze_table(table: str):
+    """Refresh planner statistics (and so get_table_estimate) after a bulk load."""
+    try:
+        with get_conn() as db:
+            cursor = db.cursor()
+            cursor.execute(f'ANALYZE "{table}"')
+            db.commit()
+            cursor.close()
+    except Exception as e:
+        print(f"[db] analyze error on {table}: {e}")
+
+
 def get_table_count(table: str) -> int:
     try:
-        db     = get_conn()
-        cursor = db.cursor()
-        cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
-        count = cursor.fetchone()[0]
-        cursor.close()
-        db.close()
+        with get_conn() as db:
+            cursor = db.cursor()
+            cursor.execute(f'SELECT COUNT(*) FROM "{table}"')
+            count = cursor.fetchone()[0]
+            cursor.close()
         return count or 0
     except Exception:
         return 0
@@ -331,25 +778,30 @@ def update_record_field(table: str, sys_id: str, field: str, value) -> bool:
     if not safe:
         return False
     try:
-        db     = get_conn()
-        cursor = db.cursor()
+        with get_conn() as db:
+            cursor = db.cursor()
 
-        # Make sure the column exists before writing
-        _ensure_columns(cursor, table, {field: value})
+            # Make sure the column exists before writing
+            _ensure_columns(cursor, table, {field: value})
+            if safe in _TIMESTAMP_COLS:
+                value = _to_timestamptz(value)
 
-        cursor.execute(
-            f'UPDATE "{table}" SET "{safe}" = %s WHERE sys_id = %s',
-            (value, sys_id),
-        )
+            cursor.execute(
+                f'UPDATE "{table}" SET "{safe}" = %s WHERE sys_id = %s',
+                (value, sys_id),
+            )
 
-        if safe == "sys_updated_on" and value:
-            _update_watermark(cursor, table, str(value)[:19])
+            if safe == "sys_updated_on" and value:
+                _update_watermark(cursor, table, str(value)[:19])
 
-        db.commit()
-        cursor.close()
-        db.close()
+            db.commit()
+            cursor.close()
+
+        if safe == "sys_updated_on" and value:
+            _remember_watermark(table, str(value)[:19])
         return True
 
     except Exception as e:
         print(f"[db] update_record_field error: {e}")
+        _forget_schema(table)
         return False
@@ -1,8 +1,54 @@
 import requests
 import os
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
 from services.credentials import get_credentials
 
+# orjson parses the multi-MB Table API pages in C straight from bytes; stdlib json otherwise
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
+
+def _build_session() -> requests.Session:
+    """
+    Shared keep-alive session for every ServiceNow REST call, so pages and
+    parallel table syncs reuse TCP+TLS connections instead of reconnecting.
+    Auth is passed per request because credentials can change at login.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=16,
+        # raise_on_status=False hands the last 5xx back to the caller's own handling.
+        # read=False: a read timeout is raised at once, not retried 3× at up to
+        # 120s each — the sync's page-size and backoff logic decide what happens next
+        max_retries=Retry(total=3, read=False, backoff_factor=0.5,
+                          status_forcelist=(502, 503, 504), raise_on_status=False),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept": "application/json", "Accept-Encoding": "gzip"})
+    return session
+
+
+sn_session = _build_session()
+
+# Default Table API params: raw values, no per-reference {"link", "value"} objects,
+# and no X-Total-Count header (skips a server-side count we never read).
+LEAN_PARAMS = {
+    "sysparm_display_value":              "false",
+    "sysparm_exclude_reference_link":     "true",
+    "sysparm_suppress_pagination_header": "true",
+}
+
+
+def parse_result(response) -> list:
+    """Return the "result" list of a Table API response, parsed from the raw body."""
+    return _loads(response.content).get("result", [])
+
 
 def fetch_table(table, last_sync=None, limit=None):
     """Fetch records from a ServiceNow table using live credentials."""
@@ -18,14 +64,12 @@ def fetch_table(table, last_sync=None, limit=None):
     if limit is not None:
         url    = f"{instance}/api/now/table/{table}"
         query  = f"sys_updated_on>{last_sync}" if last_sync else ""
-        params = {"sysparm_limit": limit, "sysparm_display_value": "false"}
+        params = {"sysparm_limit": limit, **LEAN_PARAMS}
         if query:
             params["sysparm_query"] = query
-        r = requests.get(url, auth=(user, password),
-                         headers={"Accept": "application/json"},
-                         params=params, timeout=60)
+        r = sn_session.get(url, auth=(user, password), params=params, timeout=60)
         r.raise_for_status()
-        return r.json().get("result", [])
+        return parse_result(r)
 
     # Full paginated fetch
     records = []
@@ -37,22 +81,21 @@ def fetch_table(table, last_sync=None, limit=None):
         params = {
             "sysparm_limit":  page_sz,
             "sysparm_offset": offset,
-            "sysparm_display_value": "false",
+            **LEAN_PARAMS,
         }
         if query:
             params["sysparm_query"] = query
 
-        r = requests.get(
+        r = sn_session.get(
             f"{instance}/api/now/table/{table}",
             auth=(user, password),
-            headers={"Accept": "application/json"},
             params=params,
             timeout=60,
         )
         if r.status_code in (401, 403, 404):
             break
         r.raise_for_status()
-        batch = r.json().get("result", [])
+        batch = parse_result(r)
         if not batch:
             break
         records.extend(batch)
@@ -74,13 +117,13 @@ def get_real_table_data(table, query=None, fields=None):
         return []
 
     url    = f"{instance}/api/now/table/{table}"
-    params = {}
+    params = dict(LEAN_PARAMS)
     if query:
         params["sysparm_query"] = query
     if fields:
         params["sysparm_fields"] = fields
-    response = requests.get(url, auth=HTTPBasicAuth(user, password),
-                             params=params, timeout=60)
+    response = sn_session.get(url, auth=HTTPBasicAuth(user, password),
+                              params=params, timeout=60)
     if response.status_code == 200:
-        return response.json().get("result", [])
+        return parse_result(response)
     return []
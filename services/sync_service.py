@@ -14,16 +14,23 @@ Note: All MySQL references have been replaced with Postgres equivalents.
 
 import time
 import copy
+import math
 import threading
 import requests
 import os
+import psycopg2
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from .database import upsert_records, get_last_timestamp, get_table_count
+from .database import (
+    UpsertError, upsert_records_with, sync_conn, drop_sync_conn, flush_watermarks, reset_watermark,
+    get_last_timestamp, get_table_estimate, analyze_table,
+)
+from .servicenow_client import sn_session, parse_result
 
 # =====================================================
 # SERVICENOW CONFIG — reads from live credentials store
 # =====================================================
-from services.credentials import get_credentials as _get_creds
+from services.credentials import get_credentials as _get_creds, is_configured
 
 def _inst():  return _get_creds()["instance"]
 def _user():  return _get_creds()["user"]
@@ -73,14 +80,23 @@ TABLES = {
     "sys_update_xml":      {"label": "Update Set XML",          "category": "license"},
 }
 
-SKIP_TABLES    = {"sys_hub_action_type"}
-DELTA_INTERVAL = 30   # seconds between delta cycles
+SKIP_TABLES      = {"sys_hub_action_type"}
+DELTA_INTERVAL   = 30   # seconds between delta cycles
+SYNC_PARALLELISM = int(os.getenv("SYNC_PAR", "8"))   # tables synced concurrently
+BACKOFF_MAX      = 600  # cap (seconds) on per-table backoff after 5xx / network errors
+
+# Adaptive sysparm_limit: grow on fast full pages, shrink on slow ones (seconds)
+PAGE_SIZE_MIN, PAGE_SIZE_MAX = 250, 5000
+PAGE_FAST_S,   PAGE_SLOW_S   = 2.0, 15.0
 
 # =====================================================
 # SHARED SYNC STATUS  (thread-safe)
 # =====================================================
 _sync_lock = threading.Lock()
 
+_stop          = threading.Event()   # set by stop_sync_loop() to end the delta loop
+_next_deadline = 0.0                 # time.monotonic() at which the next delta cycle starts
+
 sync_status = {
     "running":        False,
     "phase":          "IDLE",
@@ -106,6 +122,33 @@ def _init_table_status():
 
 _init_table_status()
 
+# Per-table backoff after transient ServiceNow failures: table → (delay_s, retry_at_monotonic)
+_backoff_lock = threading.Lock()
+_backoff      = {}
+
+
+class _TransientSyncError(Exception):
+    """ServiceNow answered 5xx or the request failed — worth retrying later."""
+
+
+def _backoff_fail(table):
+    with _backoff_lock:
+        delay, _ = _backoff.get(table, (0, 0.0))
+        delay = min(delay * 2 if delay else DELTA_INTERVAL, BACKOFF_MAX)
+        _backoff[table] = (delay, time.monotonic() + delay)
+    return delay
+
+
+def _backoff_reset(table):
+    with _backoff_lock:
+        _backoff.pop(table, None)
+
+
+def _backing_off(table):
+    with _backoff_lock:
+        entry = _backoff.get(table)
+    return entry is not None and time.monotonic() < entry[1]
+
 
 def _update(table, **kw):
     with _sync_lock:
@@ -115,7 +158,11 @@ def _update(table, **kw):
 
 def get_sync_status():
     with _sync_lock:
-        return copy.deepcopy(sync_status)
+        status = copy.deepcopy(sync_status)
+    # Derived on read from the deadline, so the loop never wakes just to tick a counter
+    if _next_deadline:
+        status["next_run_in"] = max(0, math.ceil(_next_deadline - time.monotonic()))
+    return status
 
 # =====================================================
 # HELPERS
@@ -130,19 +177,31 @@ def _ts_to_str(ts):
 # =====================================================
 # FETCH — cursor-based pagination (avoids offset drift)
 # =====================================================
-def _fetch_paginated(table, last_ts_str, page_size=1000):
+# Learned page size per table — kept in memory across cycles
+_page_size = {}
+
+
+def _stream_paginated(table, last_ts_str, page_size=1000):
     """
     Full sync  → last_ts_str=None  → fetch ALL records ordered by sys_id.
     Delta sync → last_ts_str set   → fetch only records where sys_updated_on > watermark.
 
     Cursor pagination via sys_id bookmark avoids SN's 10,000-offset limit.
-    Returns: (records: list[dict], max_seen_ts: str | None)
+    Generator — one page is held in memory at a time.
+    Page size starts at page_size and adapts per table: doubled after a full
+    page under PAGE_FAST_S, halved after one over PAGE_SLOW_S or a failed
+    request (which is retried once at the smaller size).
+    Yields: (batch: list[dict], last_sys_id: str, max_seen_ts: str | None)
+            where max_seen_ts covers every page yielded so far.
     """
-    records     = []
+    total       = 0
     last_sys_id = None
     max_seen_ts = last_ts_str
+    retried     = False
 
     while True:
+        page_sz = _page_size.get(table, page_size)
+
         if not last_ts_str:
             query = (
                 f"sys_id>{last_sys_id}^ORDERBYsys_id"
@@ -157,23 +216,33 @@ def _fetch_paginated(table, last_ts_str, page_size=1000):
             )
 
         params = {
-            "sysparm_limit":                  page_size,
-            "sysparm_query":                  query,
-            "sysparm_display_value":          "false",
-            "sysparm_exclude_reference_link": "true",
+            "sysparm_limit":                      page_sz,
+            "sysparm_query":                      query,
+            "sysparm_display_value":              "false",
+            "sysparm_exclude_reference_link":     "true",
+            "sysparm_suppress_pagination_header": "true",
         }
 
+        t0 = time.monotonic()
         try:
-            r = requests.get(
+            r = sn_session.get(
                 f"{_inst()}/api/now/table/{table}",
                 auth=(_user(), _pass_()),
-                headers={"Accept": "application/json"},
                 params=params,
                 timeout=120,
             )
         except requests.RequestException as e:
-            print(f"  [sync] {table} request error: {e}")
-            break
+            # Often a page too heavy for the timeout — retry once with half the rows
+            _page_size[table] = max(PAGE_SIZE_MIN, page_sz // 2)
+            if retried:
+                raise _TransientSyncError(f"request error: {e}") from e
+            retried = True
+            print(f"  [sync] {table} request error, retrying with {_page_size[table]} rows: {e}")
+            continue
+        dt = time.monotonic() - t0
+
+        if r.status_code >= 500:
+            raise _TransientSyncError(f"HTTP {r.status_code}")
 
         if r.status_code in (401, 403, 404):
             print(f"  [sync] {table} skipped — HTTP {r.status_code}")
@@ -185,9 +254,15 @@ def _fetch_paginated(table, last_ts_str, page_size=1000):
             print(f"  [sync] {table} HTTP error: {e}")
             break
 
-        batch = r.json().get("result", [])
+        batch = parse_result(r)
         if not batch:
             break
+        retried = False
+
+        if dt > PAGE_SLOW_S:
+            _page_size[table] = max(PAGE_SIZE_MIN, page_sz // 2)
+        elif dt < PAGE_FAST_S and len(batch) == page_sz:
+            _page_size[table] = min(PAGE_SIZE_MAX, page_sz * 2)
 
         last_sys_id = batch[-1].get("sys_id")
 
@@ -198,17 +273,110 @@ def _fetch_paginated(table, last_ts_str, page_size=1000):
             if ts and (max_seen_ts is None or ts > max_seen_ts):
                 max_seen_ts = ts
 
-        records.extend(batch)
-        print(f"    [sync] {table}: +{len(batch)} records (total: {len(records)})")
+        total += len(batch)
+        print(f"    [sync] {table}: +{len(batch)} records (total: {total})")
 
-        if len(batch) < page_size:
-            break
+        yield batch, last_sys_id, max_seen_ts
 
-    return records, max_seen_ts
+        if len(batch) < page_sz:
+            break
 
 # =====================================================
 # SYNC ALL TABLES  (full or delta pass)
 # =====================================================
+# Persistent workers, so each one's sync_conn() stays open across cycles
+_SYNC_EXECUTOR = ThreadPoolExecutor(max_workers=SYNC_PARALLELISM, thread_name_prefix="sync")
+
+
+def _upsert_page(table, batch, max_seen_ts):
+    """Upsert on this worker's own connection; reconnect once if it has gone away."""
+    try:
+        return upsert_records_with(sync_conn(), table, batch, max_seen_ts, defer_watermark=True)
+    except (psycopg2.InterfaceError, psycopg2.OperationalError) as e:
+        print(f"  [sync] {table} DB connection lost, reconnecting: {e}")
+        drop_sync_conn()
+        return upsert_records_with(sync_conn(), table, batch, max_seen_ts, defer_watermark=True)
+
+
+def _sync_one(table, force_full=False):
+    """
+    Sync a single table (full or delta).
+    Returns (records upserted, watermark to persist or None) — watermarks are
+    flushed for all tables at once at the end of the cycle.
+    """
+    _update(table, status="running", error=None, new_records=0)
+    watermark = None
+    full      = force_full
+
+    try:
+        if force_full:
+            last_ts_str = None
+            mode        = "FULL"
+        else:
+            last_ts     = get_last_timestamp(table)
+            last_ts_str = _ts_to_str(last_ts)
+            mode        = "DELTA" if last_ts_str else "FULL"
+        full = mode == "FULL"
+
+        _update(table, mode=mode)
+        suffix = f" since {last_ts_str}" if last_ts_str else ""
+        print(f"  [sync] {table} [{mode}]{suffix}")
+
+        # Upsert page by page so only one page is ever resident.
+        # DELTA pages come in sys_updated_on order, so each landed page is a safe
+        # watermark. FULL pages come in sys_id order: their timestamps only mean
+        # "everything up to here is synced" once every page has landed — and a
+        # failed page raises UpsertError, so getting past the loop means they all did.
+        n_new   = 0
+        seen_ts = None
+        for batch, _, max_seen_ts in _stream_paginated(table, last_ts_str):
+            n_new  += _upsert_page(table, batch, max_seen_ts)
+            seen_ts = max_seen_ts
+            if not full:
+                watermark = seen_ts
+        watermark = seen_ts
+
+        if n_new:
+            # Full loads can change the table size a lot — refresh stats so the estimate holds
+            if mode == "FULL":
+                analyze_table(table)
+            _update(
+                table,
+                records     = get_table_estimate(table),
+                new_records = n_new,
+                status      = "ok",
+                last_synced = datetime.utcnow().isoformat(),
+                error       = None,
+            )
+            print(f"  [sync] {table} ✅ +{n_new:,} upserted")
+        else:
+            _update(
+                table,
+                new_records = 0,
+                status      = "ok",
+                last_synced = datetime.utcnow().isoformat(),
+            )
+            print(f"  [sync] {table} — no changes")
+        _backoff_reset(table)
+        return n_new, watermark
+
+    except (_TransientSyncError, UpsertError) as e:
+        # Retry after a backoff; a broken FULL pass resumes from the last complete watermark
+        if full:
+            reset_watermark(table)
+        delay = _backoff_fail(table)
+        _update(table, status="error", error=f"{e} — retrying in {delay}s")
+        print(f"  [sync] {table} {e} — backing off {delay}s")
+        return 0, watermark
+
+    except Exception as e:
+        if full:
+            reset_watermark(table)
+        _update(table, status="error", error=str(e))
+        print(f"  [sync] {table} ERROR: {e}")
+        return 0, watermark
+
+
 def _sync_all_tables(force_full=False):
     with _sync_lock:
         sync_status["running"] = True
@@ -217,53 +385,25 @@ def _sync_all_tables(force_full=False):
 
     total_new = 0
 
+    to_sync = []
     for table in TABLES:
         if table in SKIP_TABLES:
             _update(table, status="skipped", error="restricted")
+        elif _backing_off(table):
             continue
+        else:
+            to_sync.append(table)
 
-        _update(table, status="running", error=None, new_records=0)
+    # Tables are independent and mostly waiting on ServiceNow — overlap them
+    watermarks = []
+    results    = _SYNC_EXECUTOR.map(lambda t: _sync_one(t, force_full), to_sync)
+    for table, (n_new, ts) in zip(to_sync, results):
+        total_new += n_new
+        if ts:
+            watermarks.append((table, ts))
 
-        try:
-            if force_full:
-                last_ts_str = None
-                mode        = "FULL"
-            else:
-                last_ts     = get_last_timestamp(table)
-                last_ts_str = _ts_to_str(last_ts)
-                mode        = "DELTA" if last_ts_str else "FULL"
-
-            _update(table, mode=mode)
-            suffix = f" since {last_ts_str}" if last_ts_str else ""
-            print(f"  [sync] {table} [{mode}]{suffix}")
-
-            records, max_seen_ts = _fetch_paginated(table, last_ts_str)
-
-            if records:
-                # upsert_records also advances watermark in table_sync_state
-                upsert_records(table, records, max_seen_ts)
-                total_new += len(records)
-                _update(
-                    table,
-                    records     = get_table_count(table),
-                    new_records = len(records),
-                    status      = "ok",
-                    last_synced = datetime.utcnow().isoformat(),
-                    error       = None,
-                )
-                print(f"  [sync] {table} ✅ +{len(records):,} upserted")
-            else:
-                _update(
-                    table,
-                    new_records = 0,
-                    status      = "ok",
-                    last_synced = datetime.utcnow().isoformat(),
-                )
-                print(f"  [sync] {table} — no changes")
-
-        except Exception as e:
-            _update(table, status="error", error=str(e))
-            print(f"  [sync] {table} ERROR: {e}")
+    # One round-trip for every table's watermark instead of one per upsert
+    flush_watermarks(watermarks)
 
     with _sync_lock:
         sync_status["running"]        = False
@@ -288,11 +428,22 @@ def start_sync_loop():
     _sync_all_tables(force_full=True)
     print(f"[sync] ✅ Full sync done. Phase 2 — DELTA every {DELTA_INTERVAL}s.")
 
+    global _next_deadline
     while True:
-        for remaining in range(DELTA_INTERVAL, 0, -1):
-            with _sync_lock:
-                sync_status["next_run_in"] = remaining
-            time.sleep(1)
+        _next_deadline = time.monotonic() + DELTA_INTERVAL
+        if _stop.wait(DELTA_INTERVAL):
+            print("[sync] ■ stopped")
+            return
+
+        # Credentials cleared — every request would just 401
+        if not is_configured():
+            continue
 
         print("[sync] 🔄 DELTA cycle …")
         _sync_all_tables(force_full=False)
+
+
+def stop_sync_loop():
+    """Wake the delta loop and make it exit before its next cycle."""
+    _stop.set()
+
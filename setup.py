@@ -4,8 +4,151 @@ ServiceNow AI Copilot Setup Script
 This script helps configure the application for first-time use.
 """
 
+import ast
+import functools
+import io
+import json
 import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from importlib.metadata import PackageNotFoundError, distribution
+from urllib.parse import urlsplit
+
+# Banner and next-steps are for people at a terminal; piped runs (CI, Render
+# build hooks) skip them and get a machine-readable result line instead
+INTERACTIVE = sys.stdout.isatty()
+
+# Status marks, with ASCII stand-ins for consoles that cannot encode them
+# (cp1252 on Windows, some CI log pipes) — printing ✓ there raises UnicodeEncodeError
+_UNICODE = (getattr(sys.stdout, 'encoding', None) or '').lower().replace('-', '').startswith('utf')
+CHECK, CROSS, FAIL, WARN, DONE = (
+    ('✓', '✗', '❌', '⚠️', '🎉') if _UNICODE else ('[OK]', '[X]', '[FAIL]', '[!]', '[DONE]')
+)
+
+class _ThreadStdout:
+    """
+    sys.stdout stand-in that routes each capturing thread's prints to its own
+    buffer (contextlib.redirect_stdout swaps the global and is not thread-safe).
+    """
+    def __init__(self, real):
+        self._real = real
+        self._local = threading.local()
+
+    def write(self, text):
+        buf = getattr(self._local, "buf", None)
+        return (self._real if buf is None else buf).write(text)
+
+    def __getattr__(self, name):
+        return getattr(self._real, name)
+
+    def capture(self, fn):
+        self._local.buf = io.StringIO()
+        try:
+            return fn(), self._local.buf.getvalue()
+        finally:
+            self._local.buf = None
+
+def run_concurrently(checks):
+    """
+    Run independent I/O-bound checks in parallel. Each check's output is held
+    back and printed in list order once all have finished.
+
+    Threads rather than an event loop: the probes use blocking clients
+    (psycopg2, requests) that asyncio would have to hand to an executor
+    anyway, and aiohttp/asyncpg are not dependencies of this app.
+    """
+    real = sys.stdout
+    proxy = _ThreadStdout(real)
+    sys.stdout = proxy
+    try:
+        with ThreadPoolExecutor(max_workers=len(checks)) as ex:
+            futures = [ex.submit(proxy.capture, fn) for _, fn in checks]
+            results = [f.result() for f in futures]
+    finally:
+        sys.stdout = real
+
+    for _, output in results:
+        print(output, end="")
+    return [(name, passed) for (name, _), (passed, _) in zip(checks, results)]
+
+def _is_env_lookup(call):
+    """True for os.getenv(...) / os.environ.get(...)."""
+    func = call.func
+    if not isinstance(func, ast.Attribute):
+        return False
+    if func.attr == "getenv":
+        return isinstance(func.value, ast.Name) and func.value.id == "os"
+    return func.attr == "get" and isinstance(func.value, ast.Attribute) and func.value.attr == "environ"
+
+def read_module_constants(path, names):
+    """
+    Read top-level NAME = <literal> assignments from a .py file without
+    importing it, so none of the module's client set-up runs. Values of the
+    form os.environ.get("VAR", default) are resolved against the current
+    environment. Names that cannot be resolved statically are left out.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    found = {}
+    for node in tree.body:
+        if not isinstance(node, ast.Assign):
+            continue
+        for target in node.targets:
+            if not (isinstance(target, ast.Name) and target.id in names):
+                continue
+            try:
+                if isinstance(node.value, ast.Call) and _is_env_lookup(node.value):
+                    args = [ast.literal_eval(a) for a in node.value.args]
+                    found[target.id] = os.environ.get(*args)
+                else:
+                    found[target.id] = ast.literal_eval(node.value)
+            except (ValueError, TypeError):
+                pass
+    return found
+
+def _subdirs(path):
+    """Names of the directories directly under path (empty if path is unreadable)."""
+    try:
+        with os.scandir(path) as entries:
+            return {e.name for e in entries if e.is_dir()}
+    except OSError:
+        return set()
+
+# Next to this script, so the wizard works from any working directory
+_OLLAMA_CLIENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ollama_client.py')
+
+def _tags_url():
+    """Model-listing URL of the configured LLM server."""
+    try:
+        llm = read_module_constants(_OLLAMA_CLIENT, {'OLLAMA_URL', 'BASE_URL'})
+    except (OSError, SyntaxError):
+        llm = {}
+    ollama_url = llm.get('OLLAMA_URL') or os.environ.get('OLLAMA_URL', '')
+    if ollama_url:
+        # Ollama: same host, /api/generate (or anything else) → /api/tags
+        return urlsplit(ollama_url)._replace(path='/api/tags', query='', fragment='').geturl()
+    # OpenAI-compatible endpoint (what ollama_client.py talks to now): GET <base>/models
+    base = llm.get('BASE_URL', '')
+    return base.rstrip('/') + '/models' if base else ''
+
+# Derived once at import instead of on every probe
+_TAGS_URL = _tags_url()
+
+# One keep-alive session for every HTTP probe; requests is imported on first use
+_session = None
+
+def _get_session():
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        _session.mount('http://', adapter)
+        _session.mount('https://', adapter)
+    return _session
 
 def print_banner():
     print("=" * 70)
@@ -13,43 +156,59 @@ def print_banner():
     print("=" * 70)
     print()
 
+MIN_PYTHON = (3, 8)
+
 def check_python_version():
     print("Checking Python version...")
-    if sys.version_info < (3, 8):
-        print("❌ Python 3.8 or higher is required")
+    py = sys.version_info
+    if py < MIN_PYTHON:
+        print(f"{FAIL} Python {MIN_PYTHON[0]}.{MIN_PYTHON[1]} or higher is required")
         print(f"   Current version: {sys.version}")
         return False
-    print(f"✓ Python {sys.version_info.major}.{sys.version_info.minor} detected")
+    print(f"{CHECK} Python {py[0]}.{py[1]} detected")
     return True
 
+REQUIRED_PACKAGES = frozenset({
+    'fastapi',
+    'uvicorn',
+    'requests',
+    'psycopg2',
+    'reportlab',
+})
+
+# Distributions that provide a module under a different name
+_DIST_NAMES = {'psycopg2': ('psycopg2', 'psycopg2-binary')}
+
+@functools.lru_cache(maxsize=None)
+def _installed_version(package):
+    """
+    Version from the package's dist-info metadata, or None — nothing is imported.
+    Cached per name; call _installed_version.cache_clear() after installing packages.
+    """
+    for dist in _DIST_NAMES.get(package, (package,)):
+        try:
+            return distribution(dist).version
+        except PackageNotFoundError:
+            continue
+    return None
+
 def check_dependencies():
     print("\nChecking dependencies...")
-    required_packages = [
-        'fastapi',
-        'uvicorn',
-        'requests',
-        'psycopg2',
-        'reportlab'
-    ]
-    
     missing = []
-    for package in required_packages:
-        try:
-            if package == 'psycopg2':
-                __import__('psycopg2')
-            else:
-                __import__(package)
-            print(f"✓ {package}")
-        except ImportError:
-            print(f"✗ {package} - NOT INSTALLED")
+    for package in sorted(REQUIRED_PACKAGES):
+        version = _installed_version(package)
+        if version is not None:
+            print(f"{CHECK} {package} {version}")
+        else:
+            print(f"{CROSS} {package} - NOT INSTALLED")
             missing.append(package)
     
     if missing:
-        print("\n❌ Missing packages detected")
+        print(f"\n{FAIL} Missing packages detected")
         print("   Run: pip install -r requirements.txt")
         return False
     
-    print("✓ All dependencies installed")
+    print(f"{CHECK} All dependencies installed")
     return True
 
 def check_directory_structure():
@@ -62,130 +221,207 @@ def check_directory_structure():
         'templates'
     ]
     
+    # Two directory listings instead of one stat per required path
+    top = _subdirs('.')
+    static_sub = _subdirs('static') if 'static' in top else set()
+    present = top | {f"static/{name}" for name in static_sub}
+    
     all_exist = True
     for dir_path in required_dirs:
-        if os.path.exists(dir_path):
-            print(f"✓ {dir_path}")
+        if dir_path in present:
+            print(f"{CHECK} {dir_path}")
         else:
-            print(f"✗ {dir_path} - MISSING")
+            print(f"{CROSS} {dir_path} - MISSING")
             all_exist = False
     
     if not all_exist:
-        print("\n❌ Directory structure incomplete")
+        print(f"\n{FAIL} Directory structure incomplete")
         return False
     
-    print("✓ Directory structure OK")
+    print(f"{CHECK} Directory structure OK")
     return True
 
+# Public demo / PDI tenants — fine for trying the app, not for real analysis
+DEMO_TENANTS = frozenset({"dev229640"})
+
+def _sn_tenant(instance):
+    """'https://dev229640.service-now.com' → 'dev229640' ('' when there is no host)."""
+    if not instance:
+        return ""
+    # urlsplit only finds the host after '//' — accept a bare hostname too
+    host = urlsplit(instance if "//" in instance else "//" + instance).hostname or ""
+    return host.split(".")[0]
+
 def check_configuration():
     print("\nChecking configuration files...")
     
-    # Check MySQL configuration
-    try:
-        db_url = os.environ.get('DATABASE_URL', '')
-        if db_url:
-            print(f"✓ DATABASE_URL found")
-            print(f"  - URL: {db_url[:40]}...")
-        else:
-            print("✗ DATABASE_URL not set — add it to environment variables")
-    except Exception as e:
-        print(f"✗ Postgres config error: {e}")
-        return False
+    # Check Postgres configuration
+    db_url = os.environ.get('DATABASE_URL', '')
+    if db_url:
+        print(f"{CHECK} DATABASE_URL found")
+        print(f"  - URL: {db_url[:40]}...")
+    else:
+        print(f"{CROSS} DATABASE_URL not set — add it to environment variables")
     
-    # Check ServiceNow configuration
-    try:
-        from services.servicenow_client import SN_INSTANCE, SN_USER, SN_PASS
-        print(f"✓ ServiceNow config found")
+    # Check ServiceNow configuration — services/credentials.py seeds itself from
+    # these variables; read them directly rather than importing the clients
+    SN_INSTANCE = os.environ.get('SN_INSTANCE', '')
+    SN_USER = os.environ.get('SN_USERNAME', '')
+    if SN_INSTANCE:
+        print(f"{CHECK} ServiceNow config found")
         print(f"  - Instance: {SN_INSTANCE}")
         print(f"  - User: {SN_USER}")
         
-        if 'dev229640' in SN_INSTANCE:
-            print("  ⚠️  Warning: Using demo instance URL")
-    except Exception as e:
-        print(f"✗ ServiceNow config error: {e}")
-        return False
+        if _sn_tenant(SN_INSTANCE) in DEMO_TENANTS:
+            print(f"  {WARN}  Warning: Using demo instance URL")
+    else:
+        print(f"{CROSS} SN_INSTANCE not set — credentials will be entered at login")
     
-    # Check Ollama configuration
+    # Check Ollama configuration — parsed from ollama_client.py, not imported
     try:
-        from ollama_client import OLLAMA_URL, MODEL
-        print(f"✓ Ollama config found")
-        print(f"  - URL: {OLLAMA_URL}")
-        print(f"  - Model: {MODEL}")
-    except Exception as e:
-        print(f"✗ Ollama config error: {e}")
+        llm = read_module_constants(_OLLAMA_CLIENT, {'OLLAMA_URL', 'BASE_URL', 'MODEL'})
+    except (OSError, SyntaxError) as e:
+        print(f"{CROSS} Ollama config error: {e}")
         return False
+    OLLAMA_URL = llm.get('OLLAMA_URL') or llm.get('BASE_URL') or os.environ.get('OLLAMA_URL', '')
+    MODEL = llm.get('MODEL', '')
+    if not (OLLAMA_URL and MODEL):
+        print(f"{CROSS} Ollama config error: endpoint URL / MODEL not found in ollama_client.py")
+        return False
+    print(f"{CHECK} Ollama config found")
+    print(f"  - URL: {OLLAMA_URL}")
+    print(f"  - Model: {MODEL}")
     
     return True
 
 def test_postgres_connection():
     print("\nTesting Postgres connection...")
     try:
-        from services.database import get_conn
-        conn = get_conn()
-        conn.close()
-        print("✓ Postgres connection successful")
+        import psycopg2
+        from services.database import DATABASE_URL, _fix_scheme
+        if not DATABASE_URL:
+            # An empty DSN would quietly try the local default socket instead
+            print(f"{CROSS} Postgres connection failed: DATABASE_URL is not set")
+            return False
+        # One direct connection rather than the app's pool: give up on an
+        # unreachable host after 5s (not the OS's ~75s+ SYN retries) and cap the probe query
+        conn = psycopg2.connect(
+            _fix_scheme(DATABASE_URL),
+            sslmode="require",
+            connect_timeout=5,
+            options="-c statement_timeout=3000",
+        )
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        finally:
+            conn.close()
+        print(f"{CHECK} Postgres connection successful")
         return True
     except Exception as e:
-        print(f"✗ Postgres connection failed: {e}")
+        print(f"{CROSS} Postgres connection failed: {e}")
         print("  Please ensure DATABASE_URL is set correctly")
         return False
 
 def test_ollama_connection():
     print("\nTesting Ollama connection...")
     try:
-        import requests
-        from ollama_client import OLLAMA_URL
-        response = requests.get(OLLAMA_URL.replace('/api/generate', '/api/tags'), timeout=5)
+        if not _TAGS_URL:
+            print(f"{CROSS} Ollama connection failed: no endpoint URL configured")
+            return False
+        response = _get_session().get(_TAGS_URL, timeout=5)
         if response.status_code == 200:
-            print("✓ Ollama connection successful")
-            models = response.json().get('models', [])
+            print(f"{CHECK} Ollama connection successful")
+            payload = response.json()
+            models = payload.get('models') or payload.get('data') or []
             print(f"  Available models: {len(models)}")
             return True
         else:
-            print(f"✗ Ollama returned status {response.status_code}")
+            print(f"{CROSS} Ollama returned status {response.status_code}")
             return False
     except Exception as e:
-        print(f"✗ Ollama connection failed: {e}")
-        print("  Please ensure Ollama is running on http://localhost:11434")
+        print(f"{CROSS} Ollama connection failed: {e}")
+        print(f"  Please ensure the LLM endpoint is reachable: {_TAGS_URL}")
         return False
 
+NEXT_STEPS = "\n" + "=" * 70 + """
+  Next Steps
+""" + "=" * 70 + """
+
+1. Set the environment variables (Render → Environment, or export locally):
+
+   DATABASE_URL     Postgres connection string (required)
+   NVIDIA_API_KEY   key for the LLM endpoint in ollama_client.py
+   SN_INSTANCE      ServiceNow instance URL  (optional: the SN_* values
+   SN_USERNAME      ServiceNow user           can also be entered on the
+   SN_PASSWORD      ServiceNow password       login page)
+
+2. Ensure the LLM endpoint is reachable with the correct model
+3. Start the application:
+
+   python -m uvicorn main:app --reload
+
+4. Open your browser to: http://127.0.0.1:8000/
+
+""" + "=" * 70 + "\n"
+
 def show_next_steps():
-    print("\n" + "=" * 70)
-    print("  Next Steps")
-    print("=" * 70)
-    print()
-    print("1. Configure your ServiceNow credentials in services/servicenow_client.py")
-    print("2. Set DATABASE_URL in Render → Environment variables")
-    print("3. Ensure Ollama is running with the correct model")
-    print("4. Start the application:")
-    print()
-    print("   python -m uvicorn main:app --reload")
-    print()
-    print("5. Open your browser to: http://127.0.0.1:8000/")
-    print()
-    print("=" * 70)
+    # One write instead of a dozen print() calls
+    sys.stdout.write(NEXT_STEPS)
+
+# Stages run in order; checks in the same stage share no state and run
+# concurrently. Each check lists the checks that must pass before it is
+# worth running — otherwise it is skipped (e.g. no DB connect attempt when
+# psycopg2 is not even installed).
+CHECKS = [
+    [("Python Version", check_python_version, [])],
+    [("Directory Structure", check_directory_structure, [])],
+    [("Dependencies", check_dependencies, ["Python Version"])],
+    [("Configuration", check_configuration, ["Dependencies", "Directory Structure"])],
+    [
+        ("Postgres Connection", test_postgres_connection, ["Dependencies", "Configuration"]),
+        ("Ollama Connection", test_ollama_connection, ["Dependencies", "Configuration"]),
+    ],
+]
+
+SUMMARY_ROW = "{name:.<40} {status}\n"
 
 def main():
-    print_banner()
+    if not _UNICODE and hasattr(sys.stdout, 'reconfigure'):
+        # Remaining non-ASCII text (→, —) degrades to '?' instead of crashing the wizard
+        sys.stdout.reconfigure(errors='replace')
+    if INTERACTIVE:
+        print_banner()
     
-    checks_passed = []
+    # Run checks — True/False, or None when skipped
+    results = {}
+    for stage in CHECKS:
+        runnable = []
+        for name, check, requires in stage:
+            blocked = [dep for dep in requires if not results.get(dep)]
+            if blocked:
+                print(f"\nSkipping {name} — requires {', '.join(blocked)}")
+                results[name] = None
+            else:
+                runnable.append((name, check))
+        if len(runnable) == 1:
+            name, check = runnable[0]
+            results[name] = check()
+        elif runnable:
+            results.update(run_concurrently(runnable))
     
-    # Run checks
-    checks_passed.append(("Python Version", check_python_version()))
-    checks_passed.append(("Directory Structure", check_directory_structure()))
-    checks_passed.append(("Dependencies", check_dependencies()))
-    checks_passed.append(("Configuration", check_configuration()))
-    checks_passed.append(("Postgres Connection", test_postgres_connection()))
-    checks_passed.append(("Ollama Connection", test_ollama_connection()))
+    checks_passed = [(name, results[name]) for stage in CHECKS for name, _, _ in stage]
     
     # Summary
     print("\n" + "=" * 70)
     print("  Setup Summary")
     print("=" * 70)
     
-    for check_name, passed in checks_passed:
-        status = "✓ PASSED" if passed else "✗ FAILED"
-        print(f"{check_name:.<40} {status}")
+    rows = [
+        {"name": check_name, "status": f"{CHECK} PASSED" if passed else "- SKIPPED" if passed is None else f"{CROSS} FAILED"}
+        for check_name, passed in checks_passed
+    ]
+    sys.stdout.write("".join(SUMMARY_ROW.format_map(row) for row in rows))
     
     total_checks = len(checks_passed)
     passed_checks = sum(1 for _, passed in checks_passed if passed)
@@ -194,13 +430,18 @@ def main():
     print(f"Results: {passed_checks}/{total_checks} checks passed")
     
     if passed_checks == total_checks:
-        print("\n🎉 Setup complete! Your application is ready to run.")
-        show_next_steps()
-        return 0
+        print(f"\n{DONE} Setup complete! Your application is ready to run.")
     else:
-        print("\n⚠️  Some checks failed. Please review the errors above.")
+        print(f"\n{WARN}  Some checks failed. Please review the errors above.")
+    
+    if INTERACTIVE:
         show_next_steps()
-        return 1
+    else:
+        # true / false, or null for a skipped check
+        json.dump(dict(checks_passed), sys.stdout)
+        sys.stdout.write("\n")
+    
+    return 0 if passed_checks == total_checks else 1
 
 if __name__ == "__main__":
     sys.exit(main())